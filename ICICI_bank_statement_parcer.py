@@ -10,6 +10,40 @@ from util.bank_stmt_parser.azure_parser import client
 # Initialize the DocumentIntelligenceClient
 document_intelligence_client = client()
 
+# Regex patterns for the account header on the first page
+ACCOUNT_NUMBER_PATTERN = re.compile(r'ACCOUNT TYPE\s*(?:[^\d]*)(\d{12,})')
+ADDRESS_PATTERN = re.compile(r'\d{1,5}[-\s\w]+(?:,\s\w+){2,}', re.IGNORECASE)
+NAME_PATTERN = re.compile(r'\bMR\.[^\d]+', re.IGNORECASE)
+IFSC_PATTERN = re.compile(r'IFSC Code:\s*([A-Z0-9]+)', re.IGNORECASE)
+PERIOD_PATTERN = re.compile(
+    r'Statement of Transactions in Savings Account Number:.*?for the period (\w+ \d{2}, \d{4}) - (\w+ \d{2}, \d{4})',
+    re.DOTALL)
+
+# Canonical transaction schema; every statement table is aligned to it before concatenation
+TRANSACTION_COLUMNS = ["DATE_0", "MODE**_1", "PARTICULARS_2", "DEPOSITS_3", "WITHDRAWALS_4", "BALANCE_5"]
+DATE_COLUMN = 0
+NARRATION_COLUMN = 2
+FIRST_AMOUNT_COLUMN = 3
+BALANCE_COLUMN = 5
+# Columns whose text may wrap onto the next row of the table
+WRAPPED_COLUMNS = (1, NARRATION_COLUMN)
+# Header keywords seen on this bank's statements, checked in order against the letters of a header cell
+HEADER_KEYWORDS = [
+    ("DATE", 0),
+    ("MODE", 1),
+    ("PARTICULAR", 2),
+    ("NARRATION", 2),
+    ("DESCRIPTION", 2),
+    ("DEPOSIT", 3),
+    ("CREDIT", 3),
+    ("WITHDRAWAL", 4),
+    ("DEBIT", 4),
+    ("BALANCE", 5),
+]
+HEADER_CLEANUP_PATTERN = re.compile(r'[^A-Z]')
+DATE_VALUE_PATTERN = re.compile(r'\d{1,2}[-/. ](?:\d{1,2}|[A-Za-z]{3})[-/. ]\d{2,4}')
+AMOUNT_VALUE_PATTERN = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
 
 # Function to format bounding regions
 def format_bounding_region(bounding_regions):
@@ -96,13 +130,6 @@ def classify_transaction(transaction):
         return "OTHER", 0, trxn_type
 
 
-# Function to replace NaN with empty strings
-def replace_nan_with_empty(value):
-    if pd.isna(value):
-        return ""
-    return value
-
-
 # Function to parse balance string safely
 def parse_balance(balance_str):
     balance_str = balance_str.replace(",", "").strip()
@@ -119,6 +146,119 @@ def format_narration(narration):
     return ", ".join([f'"{part}"' for part in parts])
 
 
+# Function to read an Azure table into a grid of cell contents with collapsed whitespace
+def table_to_rows(table):
+    rows = [[""] * table.column_count for _ in range(table.row_count)]
+    for cell in table.cells:
+        rows[cell.row_index][cell.column_index] = " ".join((cell.content or "").split())
+    return rows
+
+
+# Function to find the canonical column of a header cell, or None if no keyword matches
+def match_header_cell(value):
+    key = HEADER_CLEANUP_PATTERN.sub("", value.upper())
+    if not key:
+        return None
+    for keyword, canonical_idx in HEADER_KEYWORDS:
+        if keyword in key:
+            return canonical_idx
+    return None
+
+
+# Function to map a header row to canonical column positions; returns None for non-header rows
+def match_header_row(row):
+    column_map = {}
+    for column_idx, value in enumerate(row):
+        canonical_idx = match_header_cell(value)
+        if canonical_idx is not None and canonical_idx not in column_map.values():
+            column_map[column_idx] = canonical_idx
+    if len(column_map) * 2 < len(TRANSACTION_COLUMNS):
+        return None
+
+    # Same width as the schema: fill header cells that were not recognized by position
+    if len(row) == len(TRANSACTION_COLUMNS):
+        for column_idx in range(len(row)):
+            if column_idx not in column_map and column_idx not in column_map.values():
+                column_map[column_idx] = column_idx
+    return column_map
+
+
+# Function to map a headerless table by position: trailing columns fill the schema from the right,
+# the column before them is the narration, leading columns fill from the left and surplus joins the narration
+def positional_column_map(column_count):
+    if column_count >= len(TRANSACTION_COLUMNS):
+        trailing_count = len(TRANSACTION_COLUMNS) - NARRATION_COLUMN - 1
+    else:
+        # Narrower table: only the amount columns are kept on the right
+        trailing_count = len(TRANSACTION_COLUMNS) - FIRST_AMOUNT_COLUMN
+    trailing_count = min(trailing_count, column_count - 1)
+    leading_count = min(NARRATION_COLUMN, column_count - trailing_count - 1)
+
+    column_map = {}
+    for column_idx in range(column_count):
+        if column_idx < leading_count:
+            column_map[column_idx] = column_idx
+        elif column_idx >= column_count - trailing_count:
+            column_map[column_idx] = len(TRANSACTION_COLUMNS) - (column_count - column_idx)
+        else:
+            column_map[column_idx] = NARRATION_COLUMN
+    return column_map
+
+
+# Function to check whether an aligned row only carries text wrapped from the row above
+def is_continuation_row(aligned):
+    return not any(value for idx, value in enumerate(aligned) if idx not in WRAPPED_COLUMNS)
+
+
+# Function to check whether an aligned row holds a transaction or an opening balance
+def is_transaction_row(aligned):
+    return bool(DATE_VALUE_PATTERN.match(aligned[DATE_COLUMN]) or AMOUNT_VALUE_PATTERN.match(aligned[BALANCE_COLUMN]))
+
+
+# Function to align all tables to the canonical schema and combine them into one frame
+def align_transaction_tables(tables):
+    aligned_rows = []
+    for table_idx, table in enumerate(tables):
+        rows = table_to_rows(table)
+        if not rows:
+            continue
+
+        column_map = match_header_row(rows[0])
+        if column_map is None:
+            # Headerless continuation table: align by position when its rows hold transactions
+            if not any(DATE_VALUE_PATTERN.match(row[0]) for row in rows):
+                print(f"Skipping table {table_idx}: {table.column_count} columns and no transaction rows")
+                continue
+            column_map = positional_column_map(table.column_count)
+        else:
+            unmatched = [value for idx, value in enumerate(rows[0]) if value and idx not in column_map]
+            if unmatched:
+                print(f"Table {table_idx}: ignoring unrecognized columns {unmatched}")
+
+        for row in rows:
+            # Drop the header row, including headers repeated on later pages
+            if match_header_row(row) is not None:
+                continue
+
+            aligned = [""] * len(TRANSACTION_COLUMNS)
+            for column_idx, canonical_idx in column_map.items():
+                if row[column_idx]:
+                    aligned[canonical_idx] = " ".join(part for part in (aligned[canonical_idx], row[column_idx]) if part)
+            if not any(aligned):
+                continue
+
+            if is_transaction_row(aligned):
+                aligned_rows.append(aligned)
+            elif aligned_rows and is_continuation_row(aligned):
+                previous = aligned_rows[-1]
+                for idx in WRAPPED_COLUMNS:
+                    previous[idx] = " ".join(part for part in (previous[idx], aligned[idx]) if part)
+            else:
+                print(f"Table {table_idx}: dropping row without date or balance {row}")
+
+    return pd.DataFrame(aligned_rows, columns=TRANSACTION_COLUMNS)
+
+
 def extract_data_from_text(text):
     data = {
         "account_number": "",
@@ -131,33 +271,24 @@ def extract_data_from_text(text):
         }
     }
 
-    # Regex patterns
-    account_number_pattern = re.compile(r'ACCOUNT TYPE\s*(?:[^\d]*)(\d{12,})')
-    address_pattern = re.compile(r'\d{1,5}[-\s\w]+(?:,\s\w+){2,}', re.IGNORECASE)
-    name_pattern = re.compile(r'\bMR\.[^\d]+', re.IGNORECASE)
-    ifsc_pattern = re.compile(r'IFSC Code:\s*([A-Z0-9]+)', re.IGNORECASE)
-    period_pattern = re.compile(
-        r'Statement of Transactions in Savings Account Number:.*?for the period (\w+ \d{2}, \d{4}) - (\w+ \d{2}, \d{4})',
-        re.DOTALL)
-
     # Extract data
-    account_number_match = account_number_pattern.search(text)
+    account_number_match = ACCOUNT_NUMBER_PATTERN.search(text)
     if account_number_match:
         data["account_number"] = account_number_match.group(1)
 
-    address_match = address_pattern.search(text)
+    address_match = ADDRESS_PATTERN.search(text)
     if address_match:
         data["customer_address"] = address_match.group().strip()
 
-    name_match = name_pattern.search(text)
+    name_match = NAME_PATTERN.search(text)
     if name_match:
         data["customer_name"] = name_match.group().strip()
 
-    ifsc_match = ifsc_pattern.search(text)
+    ifsc_match = IFSC_PATTERN.search(text)
     if ifsc_match:
         data["ifsc_code"] = ifsc_match.group(1).strip()
 
-    period_match = period_pattern.search(text)
+    period_match = PERIOD_PATTERN.search(text)
     if period_match:
         data["statement_period"]["from_date"] = period_match.group(1).strip()
         data["statement_period"]["to_date"] = period_match.group(2).strip()
@@ -165,6 +296,39 @@ def extract_data_from_text(text):
     return data
 
 
+# Function to read only the first page with the text-only model and return the account details
+def quick_look_icici_bank_statement(path_to_sample_documents: str):
+    result = None
+    try:
+        if not os.path.exists(path_to_sample_documents):
+            raise ValueError("File does not exist")
+        with open(path_to_sample_documents, "rb") as f:
+            poller = document_intelligence_client.begin_analyze_document(
+                model_id="prebuilt-read",
+                analyze_request=f,
+                pages="1",
+                content_type="application/octet-stream",
+            )
+            result = poller.result()
+    except Exception as e:
+        print(f"Error during document analysis: {e}")
+        raise ValueError("UNABLE TO READ THE DOCUMENT")
+
+    if not result:
+        raise ValueError("No result from document analysis")
+    if not result.pages:
+        return []
+
+    # Build the page text the same way process_icici_bank_statement does
+    first_page = result.pages[0]
+    first_page_text_str = " ".join([line.content.strip() for line in first_page.lines])
+    if "ICICI Bank".lower() not in first_page_text_str.lower():
+        raise ValueError("INCORRECT_BANK_STATEMENT")
+
+    text = "\n".join([line.content for line in first_page.lines])
+    return extract_data_from_text(text)
+
+
 def process_icici_bank_statement(path_to_sample_documents: str):
     result = None
     try:
@@ -220,31 +384,8 @@ def process_icici_bank_statement(path_to_sample_documents: str):
                 if kv_pair.key and kv_pair.value:
                     key_value_pairs[kv_pair.key.content.strip()] = kv_pair.value.content.strip()
 
-        # Process tables
-        tables = []
-        if result.tables:
-            for table in result.tables:
-                data = []
-                for row_idx in range(table.row_count):
-                    row_data = []
-                    for column_idx in range(table.column_count):
-                        cell = [cell for cell in table.cells if
-                                cell.row_index == row_idx and cell.column_index == column_idx]
-                        if cell:
-                            row_data.append(cell[0].content)
-                        else:
-                            row_data.append(None)
-                    data.append(row_data)
-                df = pd.DataFrame(data[1:], columns=data[0])
-                # Add suffix to column names to avoid duplicates
-                df.columns = [f"{col}_{i}" for i, col in enumerate(df.columns)]
-                tables.append(df)
-
-        # Convert the combined DataFrame to a list of flattened dictionaries (records)
-        if tables:
-            combined_df = pd.concat(tables, ignore_index=True, sort=False)
-        else:
-            combined_df = pd.DataFrame()
+        # Align tables to the transaction schema and combine them
+        combined_df = align_transaction_tables(result.tables or [])
 
         flattened_dict = combined_df.to_dict('records')
 
@@ -274,11 +415,11 @@ def process_icici_bank_statement(path_to_sample_documents: str):
             balance = parse_balance(balance_str)
 
             transaction_detail = {
-                "amount": replace_nan_with_empty(amount),
-                "balance": replace_nan_with_empty(balance),
-                "date": replace_nan_with_empty(transaction.get("DATE_0", "")),
-                "narration": format_narration(replace_nan_with_empty(transaction.get("PARTICULARS_2", ""))),
-                "trxn_type": replace_nan_with_empty(trxn_type)
+                "amount": amount,
+                "balance": balance,
+                "date": transaction.get("DATE_0", ""),
+                "narration": format_narration(transaction.get("PARTICULARS_2", "")),
+                "trxn_type": trxn_type
             }
             analyzed_details["trxn_details"].append(transaction_detail)
 
@@ -311,8 +452,8 @@ def process_icici_bank_statement(path_to_sample_documents: str):
                 date = pd.to_datetime(date_str, dayfirst=True, errors='coerce')
                 if pd.notnull(date):
                     analyzed_details["EOD BALANCE"]["daywise_eod_balance"].append({
-                        "date": replace_nan_with_empty(date_str),
-                        "balance": replace_nan_with_empty(balance)
+                        "date": date_str,
+                        "balance": balance
                     })
             except ValueError:
                 pass
@@ -12,6 +12,39 @@ from utility import client
 # Initialize the DocumentIntelligenceClient
 document_intelligence_client = client()
 
+# Regex pattern for the statement period on the first page
+STATEMENT_PERIOD_PATTERN = re.compile(
+    r'Account Statement from (\d{1,2} \w{3} \d{4}) to (\d{1,2} \w{3} \d{4})', re.IGNORECASE)
+
+# Canonical transaction schema; every statement table is aligned to it before concatenation
+TRANSACTION_COLUMNS = ["Txn Date_0", "Value Date_1", "Description_2", "Ref No./Cheque No._3", "Debit_4", "Credit_5", "Balance_6"]
+DATE_COLUMN = 0
+NARRATION_COLUMN = 2
+FIRST_AMOUNT_COLUMN = 4
+BALANCE_COLUMN = 6
+# Columns whose text may wrap onto the next row of the table
+WRAPPED_COLUMNS = (NARRATION_COLUMN, 3)
+# Header keywords seen on this bank's statements, checked in order against the letters of a header cell
+HEADER_KEYWORDS = [
+    ("VALUEDATE", 1),
+    ("VALUEDT", 1),
+    ("DATE", 0),
+    ("DESCRIPTION", 2),
+    ("NARRATION", 2),
+    ("PARTICULAR", 2),
+    ("REF", 3),
+    ("CHEQUE", 3),
+    ("CHQ", 3),
+    ("DEBIT", 4),
+    ("WITHDRAWAL", 4),
+    ("CREDIT", 5),
+    ("DEPOSIT", 5),
+    ("BALANCE", 6),
+]
+HEADER_CLEANUP_PATTERN = re.compile(r'[^A-Z]')
+DATE_VALUE_PATTERN = re.compile(r'\d{1,2}[-/. ](?:\d{1,2}|[A-Za-z]{3})[-/. ]\d{2,4}')
+AMOUNT_VALUE_PATTERN = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
 # Define the path to your document
 
 # Function to format bounding regions
@@ -115,6 +148,112 @@ def format_narration(narration):
     parts = [part.strip() for part in narration.split(',') if part.strip()]
     return ", ".join([f'"{part}"' for part in parts])
 
+# Function to read an Azure table into a grid of cell contents with collapsed whitespace
+def table_to_rows(table):
+    rows = [[""] * table.column_count for _ in range(table.row_count)]
+    for cell in table.cells:
+        rows[cell.row_index][cell.column_index] = " ".join((cell.content or "").split())
+    return rows
+
+# Function to find the canonical column of a header cell, or None if no keyword matches
+def match_header_cell(value):
+    key = HEADER_CLEANUP_PATTERN.sub("", value.upper())
+    if not key:
+        return None
+    for keyword, canonical_idx in HEADER_KEYWORDS:
+        if keyword in key:
+            return canonical_idx
+    return None
+
+# Function to map a header row to canonical column positions; returns None for non-header rows
+def match_header_row(row):
+    column_map = {}
+    for column_idx, value in enumerate(row):
+        canonical_idx = match_header_cell(value)
+        if canonical_idx is not None and canonical_idx not in column_map.values():
+            column_map[column_idx] = canonical_idx
+    if len(column_map) * 2 < len(TRANSACTION_COLUMNS):
+        return None
+
+    # Same width as the schema: fill header cells that were not recognized by position
+    if len(row) == len(TRANSACTION_COLUMNS):
+        for column_idx in range(len(row)):
+            if column_idx not in column_map and column_idx not in column_map.values():
+                column_map[column_idx] = column_idx
+    return column_map
+
+# Function to map a headerless table by position: trailing columns fill the schema from the right,
+# the column before them is the narration, leading columns fill from the left and surplus joins the narration
+def positional_column_map(column_count):
+    if column_count >= len(TRANSACTION_COLUMNS):
+        trailing_count = len(TRANSACTION_COLUMNS) - NARRATION_COLUMN - 1
+    else:
+        # Narrower table: only the amount columns are kept on the right
+        trailing_count = len(TRANSACTION_COLUMNS) - FIRST_AMOUNT_COLUMN
+    trailing_count = min(trailing_count, column_count - 1)
+    leading_count = min(NARRATION_COLUMN, column_count - trailing_count - 1)
+
+    column_map = {}
+    for column_idx in range(column_count):
+        if column_idx < leading_count:
+            column_map[column_idx] = column_idx
+        elif column_idx >= column_count - trailing_count:
+            column_map[column_idx] = len(TRANSACTION_COLUMNS) - (column_count - column_idx)
+        else:
+            column_map[column_idx] = NARRATION_COLUMN
+    return column_map
+
+# Function to check whether an aligned row only carries text wrapped from the row above
+def is_continuation_row(aligned):
+    return not any(value for idx, value in enumerate(aligned) if idx not in WRAPPED_COLUMNS)
+
+# Function to check whether an aligned row holds a transaction or an opening balance
+def is_transaction_row(aligned):
+    return bool(DATE_VALUE_PATTERN.match(aligned[DATE_COLUMN]) or AMOUNT_VALUE_PATTERN.match(aligned[BALANCE_COLUMN]))
+
+# Function to align all tables to the canonical schema and combine them into one frame
+def align_transaction_tables(tables):
+    aligned_rows = []
+    for table_idx, table in enumerate(tables):
+        rows = table_to_rows(table)
+        if not rows:
+            continue
+
+        column_map = match_header_row(rows[0])
+        if column_map is None:
+            # Headerless continuation table: align by position when its rows hold transactions
+            if not any(DATE_VALUE_PATTERN.match(row[0]) for row in rows):
+                print(f"Skipping table {table_idx}: {table.column_count} columns and no transaction rows")
+                continue
+            column_map = positional_column_map(table.column_count)
+        else:
+            unmatched = [value for idx, value in enumerate(rows[0]) if value and idx not in column_map]
+            if unmatched:
+                print(f"Table {table_idx}: ignoring unrecognized columns {unmatched}")
+
+        for row in rows:
+            # Drop the header row, including headers repeated on later pages
+            if match_header_row(row) is not None:
+                continue
+
+            aligned = [""] * len(TRANSACTION_COLUMNS)
+            for column_idx, canonical_idx in column_map.items():
+                if row[column_idx]:
+                    aligned[canonical_idx] = " ".join(part for part in (aligned[canonical_idx], row[column_idx]) if part)
+            if not any(aligned):
+                continue
+
+            if is_transaction_row(aligned):
+                aligned_rows.append(aligned)
+            elif aligned_rows and is_continuation_row(aligned):
+                previous = aligned_rows[-1]
+                for idx in WRAPPED_COLUMNS:
+                    previous[idx] = " ".join(part for part in (previous[idx], aligned[idx]) if part)
+            else:
+                print(f"Table {table_idx}: dropping row without date or balance {row}")
+
+    return pd.DataFrame(aligned_rows, columns=TRANSACTION_COLUMNS)
+
 def extract_account_details(key_value_dict):
     account_details = {
         "account_number": key_value_dict.get('Account Number\n:', ''),
@@ -129,9 +268,7 @@ def extract_account_details(key_value_dict):
     return account_details
 
 def extract_statement_period(statement_period_str):
-    # Define the regex pattern for extracting dates
-    pattern = r'Account Statement from (\d{1,2} \w{3} \d{4}) to (\d{1,2} \w{3} \d{4})'
-    match = re.search(pattern, statement_period_str, re.IGNORECASE)
+    match = STATEMENT_PERIOD_PATTERN.search(statement_period_str)
     
     if match:
         from_date_str = match.group(1)
@@ -151,6 +288,43 @@ def extract_statement_period(statement_period_str):
         print(f"No match found in: {statement_period_str}")
     return "", ""
 
+# Function to analyze only the first page and return the account details, skipping tables
+def quick_look_sbi_stmt(path_to_sample_documents: str):
+    result = None
+    try:
+        if not os.path.exists(path_to_sample_documents):
+            raise ValueError("FILE DOES NOT EXIST")
+        with open(path_to_sample_documents, "rb") as f:
+            poller = document_intelligence_client.begin_analyze_document(
+                model_id="prebuilt-layout",
+                analyze_request=f,
+                pages="1",
+                features=[DocumentAnalysisFeature.KEY_VALUE_PAIRS],
+                content_type="application/octet-stream",
+            )
+            result: AnalyzeResult = poller.result()
+    except Exception as e:
+        raise ValueError("CAN NOT READ THE DOCUMENT")
+
+    if not result.pages:
+        return []
+
+    first_page_text_str = " ".join(line.content.strip() for line in result.pages[0].lines)
+    if "SBI".lower() not in first_page_text_str.lower():
+        raise ValueError("INCORRECT_BANK_STATEMENT")
+
+    key_value_pairs = {}
+    if result.key_value_pairs:
+        for kv_pair in result.key_value_pairs:
+            if kv_pair.key and kv_pair.value:
+                key_value_pairs[kv_pair.key.content.strip()] = kv_pair.value.content.strip()
+
+    account_details = extract_account_details(key_value_pairs)
+    from_date, to_date = extract_statement_period(first_page_text_str)
+    account_details["statement_period"]["from_date"] = from_date
+    account_details["statement_period"]["to_date"] = to_date
+    return account_details
+
 def process_sbi_stmt(path_to_sample_documents: str):
     result = None
     first_page_text_str = ""
@@ -197,27 +371,7 @@ def process_sbi_stmt(path_to_sample_documents: str):
         account_details["statement_period"]["from_date"] = from_date
         account_details["statement_period"]["to_date"] = to_date
 
-        tables = []
-        if result.tables:
-            for table in result.tables:
-                data = []
-                for row_idx in range(table.row_count):
-                    row_data = []
-                    for column_idx in range(table.column_count):
-                        cell = [cell for cell in table.cells if cell.row_index == row_idx and cell.column_index == column_idx]
-                        if cell:
-                            row_data.append(cell[0].content)
-                        else:
-                            row_data.append(None)
-                    data.append(row_data)
-                df = pd.DataFrame(data[1:], columns=data[0])
-                df.columns = [f"{col}_{i}" for i, col in enumerate(df.columns)]
-                tables.append(df)
-
-        if tables:
-            combined_df = pd.concat(tables, ignore_index=True, sort=False)
-        else:
-            combined_df = pd.DataFrame()
+        combined_df = align_transaction_tables(result.tables or [])
 
         flattened_dict = combined_df.to_dict('records')
 
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+icici = pytest.importorskip("ICICI_bank_statement_parcer")
+sbi = pytest.importorskip("SBI_bank_statement_parcer")
+
+ICICI_HEADER = ["DATE", "MODE**", "PARTICULARS", "DEPOSITS", "WITHDRAWALS", "BALANCE"]
+SBI_HEADER = ["Txn Date", "Value Date", "Description", "Ref No./Cheque\nNo.", "Debit", "Credit", "Balance"]
+
+
+# Function to build a fake Azure table from a list of rows; None leaves the cell out
+def make_table(rows):
+    cells = [
+        SimpleNamespace(row_index=row_idx, column_index=column_idx, content=value)
+        for row_idx, row in enumerate(rows)
+        for column_idx, value in enumerate(row)
+        if value is not None
+    ]
+    return SimpleNamespace(row_count=len(rows), column_count=len(rows[0]), cells=cells)
+
+
+# Function to run the alignment stage and return plain lists of rows
+def align(module, *tables):
+    return module.align_transaction_tables([make_table(rows) for rows in tables]).values.tolist()
+
+
+def test_icici_header_table_keeps_opening_balance_and_drops_repeated_header():
+    rows = align(icici, [
+        ICICI_HEADER,
+        ["", "", "B/F", "", "", "1,000.00"],
+        ["01-04-2024", "", "UPI/abc", "100.00", "", "1,100.00"],
+        ICICI_HEADER,
+    ])
+    assert rows == [
+        ["", "", "B/F", "", "", "1,000.00"],
+        ["01-04-2024", "", "UPI/abc", "100.00", "", "1,100.00"],
+    ]
+
+
+def test_icici_header_variant_matches_every_column():
+    rows = align(icici, [
+        ["Date", "Mode", "Particulars", "Deposit", "Withdrawal", "Balance"],
+        ["07-04-2024", "", "z", "500.00", "", "1,500.00"],
+    ])
+    assert rows == [["07-04-2024", "", "z", "500.00", "", "1,500.00"]]
+
+
+def test_icici_headerless_continuation_and_wrapped_narration():
+    rows = align(
+        icici,
+        [ICICI_HEADER, ["01-04-2024", "", "NEFT salary", "500.00", "", "1,500.00"]],
+        [["", "", "ACME\nLTD", None, None, None], ["02-04-2024", "", "UPI/x", "", "20.00", "1,480.00"]],
+    )
+    assert rows == [
+        ["01-04-2024", "", "NEFT salary ACME LTD", "500.00", "", "1,500.00"],
+        ["02-04-2024", "", "UPI/x", "", "20.00", "1,480.00"],
+    ]
+
+
+def test_icici_row_with_amount_is_not_merged_as_narration():
+    rows = align(icici, [
+        ICICI_HEADER,
+        ["01-04-2024", "", "UPI/x", "", "10.00", "990.00"],
+        ["", "", "charges", "", "20.00", "970.00"],
+    ])
+    assert len(rows) == 2
+    assert rows[1][4] == "20.00"
+
+
+def test_icici_narrower_table_keeps_narration():
+    rows = align(icici, [["03-04-2024", "NEFT x", "5,000.00", "", "5,900.00"]])
+    assert rows == [["03-04-2024", "", "NEFT x", "5,000.00", "", "5,900.00"]]
+
+
+def test_icici_wider_table_keeps_amounts():
+    rows = align(icici, [["08-04-2024", "", "x", "y", "", "20.00", "1,480.00"]])
+    assert rows == [["08-04-2024", "", "x y", "", "20.00", "1,480.00"]]
+
+
+def test_icici_non_transaction_table_is_skipped():
+    rows = align(icici, [
+        ["Opening", "Deposits", "Withdrawals", "Closing", "Count", "Other"],
+        ["1", "2", "3", "4", "5", "6"],
+    ])
+    assert rows == []
+
+
+def test_sbi_header_table_with_wrapped_ref_and_description():
+    rows = align(sbi, [
+        SBI_HEADER,
+        ["1 Apr 2024", "1 Apr 2024", "UPI/x", "REF", "10.00", "", "990.00"],
+        ["", "", "cont", "123", "", "", ""],
+    ])
+    assert rows == [["1 Apr 2024", "1 Apr 2024", "UPI/x cont", "REF 123", "10.00", "", "990.00"]]
+
+
+def test_sbi_alternative_header_is_recognized():
+    rows = align(sbi, [
+        ["Date", "Narration", "Chq./Ref.No.", "Value Dt", "Withdrawal Amt.", "Deposit Amt.", "Closing Balance"],
+        ["1 Apr 2024", "UPI/x", "REF", "1 Apr 2024", "10.00", "", "990.00"],
+    ])
+    assert rows == [["1 Apr 2024", "1 Apr 2024", "UPI/x", "REF", "10.00", "", "990.00"]]
+
+
+def test_sbi_narrower_table_keeps_description():
+    rows = align(sbi, [["2 Apr 2024", "2 Apr 2024", "NEFT y", "", "50.00", "1,040.00"]])
+    assert rows == [["2 Apr 2024", "2 Apr 2024", "NEFT y", "", "", "50.00", "1,040.00"]]